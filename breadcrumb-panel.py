@@ -31,11 +31,13 @@
 #
 # Optional settings (Packages/User/Breadcrumb Panel.sublime-settings)
 # {
-#   "debug": false,           // log decisions to the console
-#   "update_delay_ms": 32,    // small debounce to coalesce rapid caret moves
-#   "max_scan_lines": 5000    // safety limit when walking upwards
+#   "debug": false,                // log decisions to the console
+#   "update_delay_ms": 32,         // small debounce to coalesce rapid caret moves
+#   "max_update_latency_ms": 250,  // render at least this often during sustained typing
+#   "max_scan_lines": 5000         // safety limit when walking upwards
 # }
 # You can also set a per-view flag: view.settings().set("breadcrumb_panel.debug", True)
+# Settings are cached and re-read when the settings file changes or the source view changes.
 #
 # ## Implementation notes for the curious
 #
@@ -45,22 +47,30 @@
 #   multi-line headers readable without needing language grammars.
 # - Output panel rather than popups. Predictable, persistent and click-navigable. The panel is
 #   marked with a setting so event hooks can distinguish it from normal views.
-# - Coalesced updates. A tiny async debounce and a monotonic token ensure only the latest scheduled
-#   update writes to the panel.
-# - Cheap no-op check. Before computing breadcrumbs, the plugin compares buffer_id, current row,
-#   the line’s indent units, and the buffer change_count(). If unchanged, it skips work.
-# - Dormant when hidden. Event handlers early-out unless the panel is visible and enabled.
+# - Coalesced updates. At most one async debounce timer is in flight; later events only bump a
+#   monotonic token, and the timer re-arms until the token stops moving before writing the panel,
+#   or until max_update_latency_ms has passed so sustained typing cannot starve the render.
+# - Cheap no-op check. Before computing breadcrumbs, the plugin compares buffer_id, current row and
+#   the buffer change_count(). If unchanged, it skips work without measuring any indentation.
+# - Dormant when hidden. Event handlers early-out unless the panel is visible and enabled. Panel
+#   visibility is tracked from show_panel/hide_panel window commands rather than queried per event.
 #
 # ## Limitations and future ideas
 #
 # - The approach is indentation-driven. It intentionally avoids full parsing. Per-syntax filters
 #   (for decorators, attributes or annotations that precede a header) could be added later.
 
+import threading
+import time
+
 import sublime
 import sublime_plugin
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 PANEL_NAME = "breadcrumb_panel"   # final panel name is "output.breadcrumb_panel"
+SETTINGS_FILE = "Breadcrumb Panel.sublime-settings"
+_CLOSER_CHARS = ")]},:"           # lines made only of these are never breadcrumbs
+_SCAN_CHUNK_LINES = 256           # lines fetched per view.substr call when walking upwards
 
 
 class Settings:
@@ -90,24 +100,57 @@ class Settings:
         - A dictionary containing the merged settings.
         """
 
-        default = {
-            "debug": False,
-            "max_scan_lines": 5000,
-            "update_delay_ms": 32,   # small debounce to coalesce bursts
-        }
-
-        s = sublime.load_settings("Breadcrumb Panel.sublime-settings")
-        default.update({
-            "debug": s.get("debug", default["debug"]),
-            "max_scan_lines": s.get("max_scan_lines", default["max_scan_lines"]),
-            "update_delay_ms": s.get("update_delay_ms", default["update_delay_ms"]),
-        })
-
+        # Serve the cached snapshot while the view is unchanged. `invalidate` may run on the main
+        # thread at any point, so each shared attribute is read once into a local.
+        view_id = view.id() if view else None
+        cached = STATE.settings_cache
+        if cached is not None and cached[0] == view_id:
+            return cached[1]
+
+        # Note the generation we start from so a concurrent invalidate is not overwritten
+        gen = STATE.settings_gen
+
+        # The package-level settings only change via the on_change hook
+        base = STATE.settings_base
+        if base is None:
+            base = {
+                "debug": False,
+                "max_scan_lines": 5000,
+                "update_delay_ms": 32,   # small debounce to coalesce bursts
+                "max_update_latency_ms": 250,   # ceiling on re-arming during a burst
+            }
+
+            s = sublime.load_settings(SETTINGS_FILE)
+            base.update({
+                "debug": s.get("debug", base["debug"]),
+                "max_scan_lines": s.get("max_scan_lines", base["max_scan_lines"]),
+                "update_delay_ms": s.get("update_delay_ms", base["update_delay_ms"]),
+                "max_update_latency_ms": s.get("max_update_latency_ms", base["max_update_latency_ms"]),
+            })
+
+        merged = dict(base)
         if view:
             v = view.settings()
             if v.has("breadcrumb_panel.debug"):
-                default["debug"] = bool(v.get("breadcrumb_panel.debug"))
-        return default
+                merged["debug"] = bool(v.get("breadcrumb_panel.debug"))
+
+        # Publish only if nothing was invalidated while we were reading
+        with STATE.settings_lock:
+            if STATE.settings_gen == gen:
+                STATE.settings_base = base
+                STATE.settings_cache = (view_id, merged)
+        return merged
+
+    @staticmethod
+    def invalidate() -> None:
+        """
+        Drop the cached settings so the next `load` re-reads them.
+        """
+
+        with STATE.settings_lock:
+            STATE.settings_gen += 1
+            STATE.settings_base = None
+            STATE.settings_cache = None
 
 
 def _dbg(enabled: bool, *args) -> None:
@@ -123,7 +166,7 @@ def _dbg(enabled: bool, *args) -> None:
         print("[breadcrumb-panel]", *args)
 
 
-def _leading_indent_units(view: sublime.View, line_region: sublime.Region) -> int:
+def _leading_indent_units(view: sublime.View, line_region: sublime.Region, tab_size: int) -> int:
     """
     Calculate the number of leading indentation units for a given line.
 
@@ -134,25 +177,42 @@ def _leading_indent_units(view: sublime.View, line_region: sublime.Region) -> in
     Parameters:
     - `view`: The Sublime Text view object.
     - `line_region`: The region of the line for which to calculate the indentation.
+    - `tab_size`: The tab size to measure with, as resolved by the caller.
 
     Returns:
     - The number of leading indentation units.
     """
 
-    tab_size = int(view.settings().get("tab_size") or 4)
-    text = view.substr(line_region)
-    i = 0
-    cols = 0
+    return _indent_units(view.substr(line_region), tab_size)
+
+
+def _indent_units(text: str, tab_size: int) -> int:
+    """
+    Calculate the number of leading indentation units for a line of text.
+
+    Parameters:
+    - `text`: The line text.
+    - `tab_size`: The number of columns per indentation unit and tab stop.
 
-    while i < len(text):
-        ch = text[i]
+    Returns:
+    - The number of leading indentation units, rounded down.
+    """
+
+    # Measure the whitespace prefix in C; pure-space indentation needs no column arithmetic
+    lead = len(text) - len(text.lstrip(" \t"))
+    if lead == 0:
+        return 0
+    prefix = text[:lead]
+    if "\t" not in prefix:
+        return lead // tab_size
+
+    # Mixed tabs and spaces: tabs advance to the next tab stop
+    cols = 0
+    for ch in prefix:
         if ch == " ":
             cols += 1
-        elif ch == "\t":
-            cols += tab_size - (cols % tab_size)
         else:
-            break
-        i += 1
+            cols += tab_size - (cols % tab_size)
     return cols // tab_size
 
 
@@ -167,7 +227,7 @@ def _is_blank(text: str) -> bool:
     - `True` if the string is blank (i.e., contains only whitespace), `False` otherwise.
     """
 
-    return text.strip() == ""
+    return not text.strip()
 
 
 def _is_only_closer(line_text: str) -> bool:
@@ -185,13 +245,63 @@ def _is_only_closer(line_text: str) -> bool:
     """
 
     s = line_text.strip()
-    if not s:
-        return False
+    return bool(s) and not s.lstrip(_CLOSER_CHARS)
 
-    for ch in s:
-        if ch not in ")]},:":
-            return False
-    return True
+
+def _lines_above(view: sublime.View, row: int, limit: int) -> Iterator[Tuple[int, str]]:
+    """
+    Yield the lines above a row, nearest first.
+
+    Lines are fetched in chunks of `_SCAN_CHUNK_LINES` with a single `view.substr` per chunk and
+    split locally, so a long walk costs a handful of API calls rather than one per line. Later
+    chunks are only fetched if the caller keeps iterating.
+
+    Parameters:
+    - `view`: The Sublime Text view object.
+    - `row`: The row (0-indexed) to start above; it is not yielded itself.
+    - `limit`: The maximum number of lines to yield.
+
+    Returns:
+    - An iterator of (row, line text) tuples, rows 0-indexed and decreasing.
+    """
+
+    stop = max(0, row - limit)
+    end_row = row
+    while end_row > stop:
+        start_row = max(stop, end_row - _SCAN_CHUNK_LINES)
+
+        # Everything from the start of start_row up to (not including) the newline ending end_row - 1
+        blob = view.substr(sublime.Region(view.text_point(start_row, 0), view.text_point(end_row, 0) - 1))
+        lines = blob.split("\n")
+        for offset in range(len(lines) - 1, -1, -1):
+            yield (start_row + offset, lines[offset])
+        end_row = start_row
+
+
+def _row_cache(store: dict, view: sublime.View, *tag) -> dict:
+    """
+    Return a per-row cache for the view's buffer from one of the STATE cache stores.
+
+    Entries in `store` are keyed by buffer_id and tagged with the buffer's change_count() plus any
+    extra `tag` values the cached data depends on; if the tag differs, the rows are discarded and an
+    empty dict is returned.
+
+    Parameters:
+    - `store`: The STATE dictionary holding buffer_id -> (tag, {row: value}) entries.
+    - `view`: The Sublime Text view object.
+    - `*tag`: Additional values the cached rows were computed with (e.g. tab size).
+
+    Returns:
+    - A dictionary mapping rows (0-indexed) to cached values, to be read and filled by the caller.
+    """
+
+    buf_id = view.buffer_id()
+    key = (view.change_count(),) + tag
+    entry = store.get(buf_id)
+    if entry is None or entry[0] != key:
+        entry = (key, {})
+        store[buf_id] = entry
+    return entry[1]
 
 
 def _find_breadcrumb_lines(view: sublime.View, row: int, debug: bool, max_scan: int) -> List[Tuple[int, str, int]]:
@@ -213,21 +323,31 @@ def _find_breadcrumb_lines(view: sublime.View, row: int, debug: bool, max_scan:
     indentation units. The list is ordered from top to bottom in the view.
     """
 
-    # Collect all line regions and bail out on empty buffers
-    regions = view.lines(sublime.Region(0, view.size()))
-    if not regions:
-        return []
+    # Clamp target row and fetch the caret line region; lines above are fetched in chunks
+    last_row = view.rowcol(view.size())[0]
+    row = max(0, min(row, last_row))
+    current_line = view.line(view.text_point(row, 0))
 
-    # Clamp target row and fetch the caret line region
-    row = max(0, min(row, len(regions) - 1))
-    current_line = regions[row]
+    # Resolve tab size once for the walk and fetch this buffer's indent cache
+    tab_size = int(view.settings().get("tab_size") or 4)
+    indent_cache = _row_cache(STATE.indent_cache, view, tab_size)
+
+    # Reuse the previous walk from this row while the buffer is unchanged
+    crumbs_cache = _row_cache(STATE.crumbs_cache, view, tab_size, max_scan)
+    cached = crumbs_cache.get(row)
+    if cached is not None:
+        _dbg(debug, "caret_row=", row + 1, "crumbs (cached)=", [(ln, units) for (ln, _t, units) in cached])
+        return cached
 
     # Measure current line’s indent (units) and trace it
-    curr_units = _leading_indent_units(view, current_line)
+    curr_units = indent_cache.get(row)
+    if curr_units is None:
+        curr_units = indent_cache[row] = _leading_indent_units(view, current_line, tab_size)
     _dbg(debug, "caret_row=", row + 1, "curr_indent_units=", curr_units)
 
     # If at top level there are no ancestors to show
     if curr_units == 0:
+        crumbs_cache[row] = []
         return []
 
     # Prepare output and set the initial ancestor indent threshold
@@ -235,57 +355,51 @@ def _find_breadcrumb_lines(view: sublime.View, row: int, debug: bool, max_scan:
     target_units = curr_units
 
     # Walk upwards collecting lines with strictly lesser indent
-    i = row - 1
-    scanned = 0
-    while i >= 0 and target_units > 0 and scanned < max_scan:
-        r = regions[i]
-        text = view.substr(r)
-        units = _leading_indent_units(view, r)
-        scanned += 1
+    for i, text in _lines_above(view, row, max_scan):
+        units = indent_cache.get(i)
+        if units is None:
+            units = indent_cache[i] = _indent_units(text, tab_size)
 
         # Ignore blank lines entirely
         if _is_blank(text):
-            i -= 1
             continue
 
         _dbg(debug, "scan_up row=", i + 1, "units=", units, "target=", target_units, "text=", text.rstrip())
 
         # Accept true ancestors (lesser indent) but skip pure “closer” lines
         if units < target_units and not _is_only_closer(text):
-            out.append((view.rowcol(r.begin())[0] + 1, text.rstrip(), units))
+            out.append((i + 1, text.rstrip(), units))
             target_units = units
             if target_units == 0:
                 break
 
-        i -= 1
-
     # Present from outermost to nearest and trace the result
     out.reverse()
+    crumbs_cache[row] = out
     _dbg(debug, "crumbs=", [(ln, units) for (ln, _t, units) in out])
     return out
 
 
-def _current_row_and_units(view: sublime.View) -> Tuple[int, int]:
+def _current_row(view: sublime.View) -> int:
     """
-    Return the current row and units of indentation for the current selection.
+    Return the current row for the current selection.
+
+    This is the cheap half of the context check: it only needs a rowcol() lookup. Indentation
+    units are measured lazily by the render pass, which caches them per row.
 
-    If there is no selection, return (-1, 0).
+    If there is no selection, return -1.
 
     Parameters:
     - `view`: The Sublime Text view object.
 
     Returns:
-    - A tuple containing the current row (`int`) and units of indentation (`int`).
+    - The current row (`int`, 0-indexed).
     """
 
     sel = view.sel()
     if not sel:
-        return (-1, 0)
-
-    caret = sel[0].begin()
-    row, _ = view.rowcol(caret)
-    line_region = view.line(caret)
-    return (row, _leading_indent_units(view, line_region))
+        return -1
+    return view.rowcol(sel[0].begin())[0]
 
 
 class BreadcrumbPanelState:
@@ -299,25 +413,73 @@ class BreadcrumbPanelState:
 
     def __init__(self) -> None:
         self.enabled = False
+        self.visible_windows = set()  # ids of windows currently showing our panel
         self.updating_panel = False
         self.last_key = None
         self.seq = 0                 # monotonically increasing token for scheduled updates
         self.last_scheduled = 0      # id of the most recently scheduled update
+        self.timer_pending = False   # True while an update timer is in flight
+        self.pending_since_ms = 0.0  # monotonic time the in-flight burst started
+        self.timer_lock = threading.Lock()  # guards seq, last_scheduled and timer_pending
+        self.scheduled_window = None  # window targeted by the most recent request
 
         # remember the last *context* that produced the panel
-        # keyed by buffer_id -> (row, indent_units, change_count)
+        # keyed by buffer_id -> (row, change_count)
         self.context_by_buffer = {}
 
+        # output panel view id, keyed by window id
+        self.panel_by_window = {}
+
+        # source line numbers (1-indexed) shown on each panel row, keyed by panel view id
+        self.panel_rows = {}
+
+        # indent units per row, keyed by buffer_id -> ((change_count, tab_size), {row: units})
+        self.indent_cache = {}
+
+        # last resolved source view, keyed by (window_id, active_group) -> view_id; filled on the
+        # async thread and cleared by on_activated on the main thread, hence the lock and generation
+        self.src_view_cache = {}
+        self.src_view_gen = 0        # bumped by every activation
+        self.src_view_lock = threading.Lock()
+
+        # breadcrumb walks per caret row,
+        # keyed by buffer_id -> ((change_count, tab_size, max_scan), {row: crumbs})
+        self.crumbs_cache = {}
+
+        # merged settings snapshot as (view_id, settings), valid until invalidated; load() runs on
+        # the async thread while invalidate() runs on the main thread, hence the lock and generation
+        self.settings_base = None    # package-level settings, without view overrides
+        self.settings_cache = None
+        self.settings_gen = 0        # bumped by every invalidate
+        self.settings_lock = threading.Lock()
+
 
 STATE = BreadcrumbPanelState()
 
 
+def plugin_loaded() -> None:
+    """
+    Watch the package settings so the cached snapshot is dropped whenever they change.
+    """
+
+    sublime.load_settings(SETTINGS_FILE).add_on_change(PANEL_NAME, Settings.invalidate)
+
+
+def plugin_unloaded() -> None:
+    """
+    Stop watching the package settings.
+    """
+
+    sublime.load_settings(SETTINGS_FILE).clear_on_change(PANEL_NAME)
+
+
 def _panel_view(window: sublime.Window) -> sublime.View:
     """
     Create a panel view for output.
 
     This function creates a new output panel in the specified window, configuring its settings to
-    hide the gutter, line numbers, and enable word wrapping. The panel is also made read-only.
+    hide the gutter, line numbers, and enable word wrapping. The panel is also made read-only. The
+    panel is remembered per window, so later calls return it without reconfiguring it.
 
     Parameters:
     - `window`: The Sublime Text window in which to create the panel.
@@ -326,7 +488,17 @@ def _panel_view(window: sublime.Window) -> sublime.View:
     - A Sublime Text view object representing the created panel.
     """
 
+    # Reuse the panel already created for this window while it is still alive
+    wid = window.id()
+    pid = STATE.panel_by_window.get(wid)
+    if pid is not None:
+        panel = sublime.View(pid)
+        if panel.is_valid():
+            return panel
+        STATE.panel_rows.pop(pid, None)
+
     panel = window.create_output_panel(PANEL_NAME)
+    STATE.panel_by_window[wid] = panel.id()
     s = panel.settings()
     s.set("gutter", False)
     s.set("line_numbers", False)
@@ -337,31 +509,57 @@ def _panel_view(window: sublime.Window) -> sublime.View:
     return panel
 
 
-def _set_panel_text(panel: sublime.View, text: str) -> None:
+def _set_panel_text(panel: sublime.View, text: str, rows: List[int]) -> None:
     """
     Clear the current panel text and replace it with the provided string.
 
-    This method temporarily disables read-only mode, selects all text, deletes it, and then
-    appends the new text. If an error occurs during this process, the panel will still be restored
-    to its original state.
+    The whole buffer is replaced in a single `breadcrumb_panel_replace` command, so each refresh
+    costs one edit rather than separate select, delete and append commands. The row mapping used
+    for click navigation is published under the same updating guard, so a click never pairs new
+    text with old rows. The updating flag is cleared even if the command raises.
 
     Parameters:
     - `panel`: The Sublime Text view to update.
-    - `text`: The new text to append to the panel.
+    - `text`: The new text to show in the panel.
+    - `rows`: The source line numbers (1-indexed) shown on each row of `text`.
     """
 
     STATE.updating_panel = True
     try:
-        panel.set_read_only(False)
-        panel.run_command("select_all")
-        panel.run_command("right_delete")
-        panel.run_command("append", {"characters": text, "force": True, "scroll_to_end": False})
+        STATE.panel_rows[panel.id()] = rows
+        panel.run_command("breadcrumb_panel_replace", {"text": text})
     finally:
-        panel.set_read_only(True)
         STATE.updating_panel = False
 
 
-def _format_breadcrumbs(view: sublime.View, debug: bool) -> str:
+class BreadcrumbPanelReplaceCommand(sublime_plugin.TextCommand):
+    """
+    Replace the entire contents of the breadcrumb panel.
+
+    Read-only mode is lifted only for the duration of the edit and is restored even if the
+    replacement fails. The command is only enabled in views marked as our panel, so it can never
+    overwrite a normal buffer.
+
+    Parameters:
+    - `edit`: The edit token supplied by Sublime Text.
+    - `text`: The new panel contents.
+    """
+
+    def is_enabled(self) -> bool:
+        return bool(self.view.settings().get("breadcrumb_panel"))
+
+    def run(self, edit: sublime.Edit, text: str) -> None:
+        if not self.is_enabled():
+            return
+
+        self.view.set_read_only(False)
+        try:
+            self.view.replace(edit, sublime.Region(0, self.view.size()), text)
+        finally:
+            self.view.set_read_only(True)
+
+
+def _format_breadcrumbs(view: sublime.View, row: int, settings: dict) -> Tuple[str, List[int]]:
     """
     Format breadcrumb information for the current view.
 
@@ -372,32 +570,31 @@ def _format_breadcrumbs(view: sublime.View, debug: bool) -> str:
 
     Parameters:
     - `view`: The Sublime Text view object.
-    - `debug`: A boolean flag indicating whether to include debug information.
+    - `row`: The caret row (0-indexed), as already resolved by the caller.
+    - `settings`: The settings already loaded by the caller via `Settings.load`.
 
     Returns:
-    - A string containing the breadcrumb lines, or an error message if no breadcrumbs were found.
+    - A tuple of the panel text, containing the breadcrumb lines or an error message if no
+    breadcrumbs were found, and the source line numbers (1-indexed) shown on each panel row.
     """
 
     sels = view.sel()
     if len(sels) != 1:
-        return "Multiple contexts\n"
-
-    caret = sels[0].begin()
-    row, _ = view.rowcol(caret)
+        return ("Multiple contexts\n", [])
 
-    s = Settings.load(view)
-    crumbs = _find_breadcrumb_lines(view, row, debug=s["debug"], max_scan=s["max_scan_lines"])
+    crumbs = _find_breadcrumb_lines(view, row, debug=settings["debug"], max_scan=settings["max_scan_lines"])
     if not crumbs:
-        return "No indent\n"
+        return ("No indent\n", [])
 
-    lines = [f"{ln:>6}:  {text}" for (ln, text, _units) in crumbs]
-    return "\n".join(lines) + "\n"
+    text = "".join(f"{ln:>6}:  {t}\n" for (ln, t, _u) in crumbs)
+    return (text, [ln for (ln, _t, _u) in crumbs])
 
 
 def _source_view_for(window: sublime.Window) -> Optional[sublime.View]:
     """
     Prefer the active file in the active group; fall back to first non-widget view.
-    Avoids accidentally reading the panel as the source.
+    Avoids accidentally reading the panel as the source. The result is cached per window and
+    active group until the next activation event.
 
     Parameters:
     - `window`: The Sublime Text window for which to find a suitable view.
@@ -406,14 +603,35 @@ def _source_view_for(window: sublime.Window) -> Optional[sublime.View]:
     - The preferred view, or `None` if no suitable view is found.
     """
 
-    v = window.active_view_in_group(window.active_group())
+    # Note the generation before resolving so a concurrent activation is not overwritten
+    gen = STATE.src_view_gen
+
+    # Reuse the last resolved view for this window/group while it is still alive
+    group = window.active_group()
+    key = (window.id(), group)
+    vid = STATE.src_view_cache.get(key)
+    if vid is not None:
+        v = sublime.View(vid)
+        if v.is_valid():
+            return v
+        STATE.src_view_cache.pop(key, None)
+
+    found = None
+    v = window.active_view_in_group(group)
     if v and not v.settings().get("is_widget"):
-        return v
+        found = v
+    else:
+        for cand in window.views():
+            if not cand.settings().get("is_widget"):
+                found = cand
+                break
 
-    for cand in window.views():
-        if not cand.settings().get("is_widget"):
-            return cand
-    return None
+    # Publish only if no activation happened while we were resolving
+    if found:
+        with STATE.src_view_lock:
+            if STATE.src_view_gen == gen:
+                STATE.src_view_cache[key] = found.id()
+    return found
 
 
 def _schedule_update(window: sublime.Window, hint_view: Optional[sublime.View]) -> None:
@@ -421,7 +639,7 @@ def _schedule_update(window: sublime.Window, hint_view: Optional[sublime.View])
     Update the breadcrumb panel with the current view's context.
 
     This function is called when a view's context changes. It updates the breadcrumb panel with the
-    new context, including the current row and units, and sets the status of the view to indicate
+    new context, including the current row, and sets the status of the view to indicate
     whether breadcrumbs are active. If the view's context has not changed since the last update, this
     function still updates the context cache to ensure the cheap check is accurate.
 
@@ -432,7 +650,7 @@ def _schedule_update(window: sublime.Window, hint_view: Optional[sublime.View])
     # Only proceed when the feature is enabled and our panel is actually visible
     if not STATE.enabled:
         return
-    if not window or window.active_panel() != "output." + PANEL_NAME:
+    if not window or window.id() not in STATE.visible_windows:
         return
 
     # Find the current source view; if none, there is nothing to update
@@ -440,32 +658,44 @@ def _schedule_update(window: sublime.Window, hint_view: Optional[sublime.View])
     if not src_view:
         return
 
-    # Snapshot the cheap context (buffer id, caret row, indent units, change count)
+    # Snapshot the cheap context (buffer id, caret row, change count); units are left to the render
     buf_id = src_view.buffer_id()
-    row, units = _current_row_and_units(src_view)
+    row = _current_row(src_view)
     cc = src_view.change_count()
 
     # If nothing relevant changed, skip scheduling altogether
     prev = STATE.context_by_buffer.get(buf_id)
-    if prev and prev == (row, units, cc):
-        # Same line, same indent, and file unchanged — context unchanged
+    if prev and prev == (row, cc):
+        # Same line and file unchanged — context unchanged
         return
 
     # Read debounce settings and prepare a new coalescing token
     s = Settings.load(hint_view)
     delay = int(s["update_delay_ms"])
+    max_latency = int(s["max_update_latency_ms"])
+
+    # Callers run on both the main and async threads, so the token bump and the
+    # check-and-set of timer_pending happen under one lock
+    with STATE.timer_lock:
+        # Bump the sequence and mark this request as the latest
+        STATE.seq += 1
+        STATE.last_scheduled = STATE.seq
+        STATE.scheduled_window = window
+
+        # At most one timer in flight; the pending one will pick up the latest request
+        if STATE.timer_pending:
+            return
 
-    # Bump the sequence and mark this schedule as the latest
-    STATE.seq += 1
-    token = STATE.seq
-    STATE.last_scheduled = token
+        STATE.timer_pending = True
+        STATE.pending_since_ms = time.monotonic() * 1000
+        token = STATE.seq
 
     def _run():
         """
         Update the breadcrumb panel with the current view's context.
 
         This function is called when a view's context changes. It updates the breadcrumb panel with
-        the new context, including the current row and units, and sets the status of the view to
+        the new context, including the current row, and sets the status of the view to
         indicate whether breadcrumbs are active. If the view's context has not changed since the last
         update, this function still updates the context cache to ensure the cheap check is accurate.
 
@@ -473,38 +703,57 @@ def _schedule_update(window: sublime.Window, hint_view: Optional[sublime.View])
         - `window`: The Sublime Text window object.
         """
 
-        # Drop stale scheduled runs that lost the coalescing race
-        if token != STATE.last_scheduled:
+        nonlocal token
+
+        # More requests arrived while we waited; re-arm so the burst settles first, unless the
+        # burst has already held the panel back for longer than the latency ceiling. The timer
+        # stays pending across a re-arm so no second chain can start in between.
+        with STATE.timer_lock:
+            rearm = (token != STATE.last_scheduled
+                     and time.monotonic() * 1000 - STATE.pending_since_ms < max_latency)
+            if rearm:
+                token = STATE.last_scheduled
+            else:
+                STATE.timer_pending = False
+
+        if rearm:
+            sublime.set_timeout_async(_run, delay)
             return
 
         # Resolve the current source view; if none, there is nothing to render
+        window = STATE.scheduled_window
+        if not window or not window.is_valid():
+            return
         src_view = _source_view_for(window)
         if not src_view:
             return
 
-        # Build a cache key based on the latest selection state
+        # Snapshot the context once; it keys the render cache and is recorded after painting
+        buf_id = src_view.buffer_id()
+        cc = src_view.change_count()
         sels = list(src_view.sel())
         sels_hash = tuple((r.a, r.b) for r in sels)
         row = src_view.rowcol(sels[0].begin())[0] if sels else -1
 
         # Skip if identical to the last render; still refresh the cheap context cache
-        key = (src_view.buffer_id(), row, sels_hash)
+        key = (buf_id, row, sels_hash)
         if key == STATE.last_key:
-            STATE.context_by_buffer[src_view.buffer_id()] = (row, _current_row_and_units(src_view)[1], src_view.change_count())
+            STATE.context_by_buffer[buf_id] = (row, cc)
             return
         STATE.last_key = key
 
         # Compute and paint the breadcrumbs into the output panel
+        settings = Settings.load(src_view)
+        debug = settings["debug"]
         panel = _panel_view(window)
-        text = _format_breadcrumbs(src_view, debug=Settings.load(src_view)["debug"])
-        _set_panel_text(panel, text)
+        text, rows = _format_breadcrumbs(src_view, row, settings)
+        _set_panel_text(panel, text, rows)
         src_view.set_status("breadcrumb_panel", f"Breadcrumbs: {'active' if STATE.enabled else 'off'} — {text.strip()[:60]}")
 
         # Record the context that produced this panel content for future cheap checks
-        cur_row, cur_units = _current_row_and_units(src_view)
-        STATE.context_by_buffer[src_view.buffer_id()] = (cur_row, cur_units, src_view.change_count())
+        STATE.context_by_buffer[buf_id] = (row, cc)
 
-        _dbg(Settings.load(src_view)["debug"], "update_panel done; text=", repr(text))
+        _dbg(debug, "update_panel done; text=", repr(text))
 
     # Run async after a tiny delay to let caret/layout settle
     sublime.set_timeout_async(_run, delay)
@@ -534,10 +783,12 @@ class ToggleBreadcrumbPanelCommand(sublime_plugin.WindowCommand):
             for v in w.views():
                 v.erase_status("breadcrumb_panel")
 
+            STATE.visible_windows.discard(w.id())
             w.run_command("hide_panel", {"panel": "output." + PANEL_NAME})
             _dbg(True, "panel hidden, plugin dormant")
         else:
             STATE.enabled = True
+            STATE.visible_windows.add(w.id())
             _panel_view(w)
             w.run_command("show_panel", {"panel": "output." + PANEL_NAME})
             _schedule_update(w, w.active_view())
@@ -550,8 +801,8 @@ class BreadcrumbPanelListener(sublime_plugin.EventListener):
     This class listens for various events in Sublime Text and updates the breadcrumb panel accordingly.
 
     It checks if the current view should be ignored, and if not, schedules an update of its associated
-    window on selection modification, activation, and modification. It also handles asynchronous
-    selection modification events and text commands.
+    window on activation and on asynchronous selection modification and modification events, keeping
+    per-keystroke work off the UI thread. It also handles text commands.
 
     The class provides methods to determine whether a view should be ignored, navigate to a specific
     line in the source view from a given panel, and handle text commands.
@@ -578,29 +829,36 @@ class BreadcrumbPanelListener(sublime_plugin.EventListener):
 
         return bool(view.settings().get("is_widget") or not STATE.enabled)
 
-    def on_activated(self, view: sublime.View) -> None:
+    def _should_skip_modified(self, view: sublime.View) -> bool:
         """
-        Schedule an update of the view's window.
+        Determine whether a modification event can be skipped without scheduling an update.
 
-        This call checks if the view should be ignored, and if not, schedules an update of its associated
-        window.
-        """
+        The render records the change_count() it painted for each buffer. If the buffer is still at
+        that count, the panel already reflects this modification and nothing needs scheduling; caret
+        moves are picked up separately by the selection handler.
 
-        if self._should_ignore(view):
-            return
+        Parameters:
+        - `view`: The Sublime Text view that was modified.
 
-        w = view.window()
-        if w:
-            _schedule_update(w, view)
+        Returns:
+        - `True` if the modification is already reflected in the panel, `False` otherwise.
+        """
 
-    def on_selection_modified(self, view: sublime.View) -> None:
+        prev = STATE.context_by_buffer.get(view.buffer_id())
+        return bool(prev and prev[1] == view.change_count())
+
+    def on_activated(self, view: sublime.View) -> None:
         """
-        Update the view window if necessary.
+        Schedule an update of the view's window.
 
-        This call checks if the current selection should be ignored, and if not, schedules an update of the
-        view window.
+        This call drops the cached source views, since activation may change which view is the source,
+        then checks if the view should be ignored, and if not, schedules an update of its associated
+        window.
         """
 
+        with STATE.src_view_lock:
+            STATE.src_view_gen += 1
+            STATE.src_view_cache.clear()
         if self._should_ignore(view):
             return
 
@@ -623,21 +881,71 @@ class BreadcrumbPanelListener(sublime_plugin.EventListener):
         if w:
             _schedule_update(w, view)
 
-    def on_modified(self, view: sublime.View) -> None:
+    def on_modified_async(self, view: sublime.View) -> None:
         """
         Update the view window if necessary after a modification.
 
-        This call checks if the current view should be ignored, and if not, updates the associated window.
-        If the view is part of a window, the window is scheduled for an update.
+        This call checks if the current view should be ignored or the modification is already reflected
+        in the panel, and if not, updates the associated window. If the view is part of a window, the
+        window is scheduled for an update.
         """
 
-        if self._should_ignore(view):
+        if self._should_ignore(view) or self._should_skip_modified(view):
             return
 
         w = view.window()
         if w:
             _schedule_update(w, view)
 
+    def on_pre_close(self, view: sublime.View) -> None:
+        """
+        Forget the per-buffer caches when the last view onto a buffer is about to close.
+        """
+
+        # Other views onto the same buffer keep it, and its cached walks, alive
+        if view.clones():
+            return
+
+        buf_id = view.buffer_id()
+        STATE.indent_cache.pop(buf_id, None)
+        STATE.crumbs_cache.pop(buf_id, None)
+        STATE.context_by_buffer.pop(buf_id, None)
+
+    def on_pre_close_window(self, window: sublime.Window) -> None:
+        """
+        Forget the panel created for a window that is about to close.
+        """
+
+        STATE.visible_windows.discard(window.id())
+        pid = STATE.panel_by_window.pop(window.id(), None)
+        if pid is not None:
+            STATE.panel_rows.pop(pid, None)
+
+    def on_window_command(self, window: sublime.Window, command_name: str, args: Optional[dict]):
+        """
+        Track panel visibility changes made outside the toggle command.
+
+        Event handlers consult the cached visibility instead of querying `window.active_panel()` on
+        every keystroke, so hiding the panel (for example with Escape) or showing another panel in
+        its place must be recorded here.
+        """
+
+        args = args or {}
+        ours = "output." + PANEL_NAME
+        wid = window.id()
+
+        if command_name == "hide_panel":
+            # Without a panel argument the active panel is hidden, whichever it is
+            if args.get("panel", ours) == ours:
+                STATE.visible_windows.discard(wid)
+        elif command_name == "show_panel":
+            # Only one panel is shown at a time, so showing any other panel hides ours
+            if args.get("panel") != ours or (args.get("toggle") and wid in STATE.visible_windows):
+                STATE.visible_windows.discard(wid)
+            else:
+                STATE.visible_windows.add(wid)
+        return None
+
     def on_text_command(self, view: sublime.View, command_name: str, args: dict):
         """
         Handle a text command in the view.
@@ -660,9 +968,9 @@ class BreadcrumbPanelListener(sublime_plugin.EventListener):
         Navigate to a specific line in the source view from the given panel.
 
         This method checks if the panel is currently being updated, and if so, it returns immediately.
-        Otherwise, it extracts the window, source view, selection, and line text from the panel.
-        It then attempts to parse the line text as a line number prefix, and if successful, it navigates
-        the source view to that line.
+        Otherwise, it extracts the window, source view and selection from the panel. It then looks up
+        the source line recorded for the clicked panel row at render time, and if there is one, it
+        navigates the source view to that line.
 
         Parameters:
         - `panel`: The sublime View instance for which to navigate.
@@ -687,23 +995,12 @@ class BreadcrumbPanelListener(sublime_plugin.EventListener):
         if not sel:
             return
 
-        # Get the full text of the clicked panel line
+        # Map the clicked panel row to the source line recorded at render time
         row, _ = panel.rowcol(sel[0].begin())
-        line_region = panel.line(panel.text_point(row, 0))
-
-        # Expect the “NNN:  …” format; otherwise ignore
-        text = panel.substr(line_region).strip()
-        if not text or ":" not in text:
-            return
-
-        # Extract the numeric line prefix
-        prefix = text.split(":", 1)[0]
-
-        # Parse the target line number; ignore malformed input
-        try:
-            line_no = int(prefix)
-        except ValueError:
+        rows = STATE.panel_rows.get(panel.id(), [])
+        if not 0 <= row < len(rows):
             return
+        line_no = rows[row]
 
         # Move the caret to that line in the source and reveal it
         pt = src.text_point(max(0, line_no - 1), 0)
@@ -734,5 +1031,6 @@ class ToggleBreadcrumbPanelDebugCommand(sublime_plugin.WindowCommand):
 
         current = bool(v.settings().get("breadcrumb_panel.debug", False))
         v.settings().set("breadcrumb_panel.debug", not current)
+        Settings.invalidate()
         sublime.status_message("Breadcrumb Panel debug: {}".format("ON" if not current else "OFF"))
         _schedule_update(self.window, v)